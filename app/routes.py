@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from . import models
 
@@ -6,6 +6,7 @@ from . import models
 from . import crud, schemas
 from .db import get_db
 from .utils import fetch_geo_details
+from .view_filter import view_filter
 
 router = APIRouter()
 
@@ -78,28 +79,57 @@ def has_liked(
 
 
 
-@router.post('/track-view', response_model=schemas.ProfileViewOut, tags=['analytics'])
+@router.post(
+    '/track-view',
+    response_model=schemas.ProfileViewOut,
+    responses={204: {'description': 'View deduplicated or filtered as bot traffic'}},
+    tags=['analytics'],
+)
 def track_view(payload: schemas.CreateView, request: Request, db: Session = Depends(get_db)):
-    # 1. Get real IP (proxy-safe)
+    # 1. Get client IP (leftmost XFF hop); every hop is kept for bot filtering
     xff = request.headers.get("x-forwarded-for")
-    if xff:
-        ip_address = xff.split(",")[0].strip()
+    peer_ip = request.client.host if request.client else ''
+    forwarded_ips = [hop.strip() for hop in xff.split(",") if hop.strip()] if xff else []
+    if forwarded_ips:
+        ip_address = forwarded_ips[0]
     else:
-        ip_address = request.client.host
+        ip_address = peer_ip
 
-    # 2. Fetch geo info
-    geo = fetch_geo_details(ip_address) or {}
-
-    # 3. Save in DB
-    view = crud.add_view(
-        db=db,
+    # 2. Drop bots and repeat views before doing any geo lookup or write
+    viewer_name = (payload.user_name or '').strip() or 'Anonymous'
+    accepted, _ = view_filter.check(
         profile_owner_id=payload.profile_owner_id,
-        viewer_name=payload.user_name or "Anonymous",
+        viewer_name=viewer_name,
         ip_address=ip_address,
-        geo_data=geo,
+        user_agent=request.headers.get('user-agent'),
+        other_ips=[*forwarded_ips[1:], peer_ip],
     )
-
-    # 4. Return response using your schema
+    if not accepted:
+        return Response(status_code=204)
+
+    try:
+        # 3. Fetch geo info
+        geo = fetch_geo_details(ip_address) or {}
+
+        # 4. Save in DB
+        view = crud.add_view(
+            db=db,
+            profile_owner_id=payload.profile_owner_id,
+            viewer_name=viewer_name,
+            ip_address=ip_address,
+            geo_data=geo,
+        )
+    except Exception:
+        # Free the dedup slot so the client's retry is not dropped as a duplicate
+        view_filter.release(
+            profile_owner_id=payload.profile_owner_id,
+            viewer_name=viewer_name,
+            ip_address=ip_address,
+        )
+        raise
+    view_filter.record_accepted()
+
+    # 5. Return response using your schema
     return schemas.ProfileViewOut(
         id=view.id,
         profile_owner_id=view.profile_owner_id,
@@ -116,6 +146,12 @@ def track_view(payload: schemas.CreateView, request: Request, db: Session = Depe
 
 
 
+@router.get('/metrics/views', tags=['analytics'])
+def view_metrics():
+    # Counters are per worker process; see app/view_filter.py
+    return view_filter.metrics()
+
+
 @router.get('/dashboard/views', response_model=schemas.ViewsResponse, tags=['analytics'])
 def dashboard_views(
     user_id: int = Query(..., gt=0), limit: int = Query(5, ge=1, le=50), db: Session = Depends(get_db)
@@ -0,0 +1,194 @@
+import ipaddress
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple, Union
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# The dedup cache and the counters below live in process memory, so under
+# `uvicorn --workers N` every worker dedups and counts on its own. Metrics
+# read from one worker are that worker's share, not global totals.
+#
+# X-Forwarded-For is client controlled. The bot IP-range check therefore looks
+# at every forwarded hop plus the socket peer address, so a crawler cannot
+# slip past it by prepending an arbitrary IP. The dedup key still uses the
+# leftmost hop, which a client can vary to split its own refreshes across
+# keys; that only costs extra writes, never a dropped real view.
+
+VIEW_DEDUP_TTL_SECONDS = float(os.getenv('VIEW_DEDUP_TTL_SECONDS', '1800'))
+VIEW_DEDUP_MAX_ENTRIES = int(os.getenv('VIEW_DEDUP_MAX_ENTRIES', '100000'))
+
+# Tokens are anchored so device names such as "CUBOT X30" are not caught by a
+# bare "bot" substring. Broader tokens (e.g. okhttp) can be opted into through
+# VIEW_BOT_USER_AGENT_PATTERN.
+DEFAULT_BOT_USER_AGENT_PATTERN = (
+    r'\bbot\b|bot/|crawler|spider|'
+    r'googlebot|bingbot|yandexbot|baiduspider|duckduckbot|slurp|applebot|ahrefsbot|semrushbot|'
+    r'mj12bot|petalbot|bytespider|gptbot|ccbot|facebookexternalhit|twitterbot|linkedinbot|'
+    r'slackbot|discordbot|telegrambot|scrapy|headlesschrome|phantomjs|'
+    r'python-requests|python-urllib|curl/|wget/|go-http-client'
+)
+BOT_USER_AGENT_PATTERN = os.getenv('VIEW_BOT_USER_AGENT_PATTERN', DEFAULT_BOT_USER_AGENT_PATTERN)
+BOT_IP_RANGES = os.getenv('VIEW_BOT_IP_RANGES', '')
+
+
+class TTLDedupCache:
+    """
+    Bounded LRU of recently seen keys. A key is a duplicate while it was last
+    recorded less than `ttl_seconds` ago; the oldest entries are evicted once
+    `max_entries` is reached.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._entries: 'OrderedDict[Hashable, float]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen_recently(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """
+        Return True if `key` is within the TTL window, otherwise record it and
+        return False. A recorded key can be dropped again with `discard`.
+        """
+
+        if self.ttl_seconds <= 0:
+            return False
+
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last_seen = self._entries.get(key)
+            if last_seen is not None and now - last_seen < self.ttl_seconds:
+                return True
+
+            self._entries[key] = now
+            self._entries.move_to_end(key)
+            self._evict(now)
+            return False
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            oldest_key, oldest_seen = next(iter(self._entries.items()))
+            if len(self._entries) > self.max_entries or now - oldest_seen >= self.ttl_seconds:
+                del self._entries[oldest_key]
+            else:
+                break
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _parse_ip_ranges(raw: str) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    networks = []
+    for chunk in raw.split(','):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(chunk, strict=False))
+        except ValueError as exc:
+            raise ValueError(f'Invalid CIDR {chunk!r} in VIEW_BOT_IP_RANGES: {exc}') from exc
+    return networks
+
+
+class ViewFilter:
+    """Decides whether an incoming profile view should be written or dropped."""
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = VIEW_DEDUP_TTL_SECONDS,
+        max_entries: int = VIEW_DEDUP_MAX_ENTRIES,
+        bot_user_agent_pattern: str = BOT_USER_AGENT_PATTERN,
+        bot_ip_ranges: str = BOT_IP_RANGES,
+    ):
+        self._dedup = TTLDedupCache(ttl_seconds, max_entries)
+        self._bot_user_agent = (
+            re.compile(bot_user_agent_pattern, re.IGNORECASE) if bot_user_agent_pattern else None
+        )
+        self._bot_networks = _parse_ip_ranges(bot_ip_ranges)
+        self._counts: Dict[str, int] = {
+            'accepted': 0,
+            'dropped_duplicate': 0,
+            'dropped_bot_user_agent': 0,
+            'dropped_bot_ip': 0,
+        }
+        self._counts_lock = threading.Lock()
+
+    def is_bot_user_agent(self, user_agent: Optional[str]) -> bool:
+        return bool(self._bot_user_agent and user_agent and self._bot_user_agent.search(user_agent))
+
+    def is_bot_ip(self, ip_address: Optional[str]) -> bool:
+        if not self._bot_networks or not ip_address:
+            return False
+        try:
+            ip = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self._bot_networks)
+
+    def check(
+        self,
+        *,
+        profile_owner_id: int,
+        viewer_name: str,
+        ip_address: str,
+        user_agent: Optional[str] = None,
+        other_ips: Iterable[str] = (),
+    ) -> Tuple[bool, str]:
+        """
+        Return `(accepted, reason)` and count drops. Bot checks run first so
+        crawler traffic never occupies a slot in the dedup cache. `ip_address`
+        is the dedup key; it and every address in `other_ips` (the remaining
+        forwarded hops and the socket peer) are matched against the bot ranges.
+
+        An accepted view reserves its dedup key but is not counted yet; the
+        caller must follow up with `record_accepted` once the view is written,
+        or `release` if the write fails so a retry is not dropped. Identical
+        requests arriving while that write is still in flight are dropped as
+        duplicates; if the write then fails, those requests are lost too and
+        stay counted as `dropped_duplicate`.
+        """
+
+        if self.is_bot_user_agent(user_agent):
+            reason = 'dropped_bot_user_agent'
+        elif any(self.is_bot_ip(ip) for ip in (ip_address, *other_ips)):
+            reason = 'dropped_bot_ip'
+        elif self._dedup.seen_recently((profile_owner_id, viewer_name, ip_address)):
+            reason = 'dropped_duplicate'
+        else:
+            return True, 'accepted'
+
+        self._increment(reason)
+        return False, reason
+
+    def record_accepted(self) -> None:
+        self._increment('accepted')
+
+    def release(self, *, profile_owner_id: int, viewer_name: str, ip_address: str) -> None:
+        self._dedup.discard((profile_owner_id, viewer_name, ip_address))
+
+    def _increment(self, reason: str) -> None:
+        with self._counts_lock:
+            self._counts[reason] += 1
+
+    def metrics(self) -> Dict[str, int]:
+        with self._counts_lock:
+            counts = dict(self._counts)
+        counts['dropped_total'] = (
+            counts['dropped_duplicate'] + counts['dropped_bot_user_agent'] + counts['dropped_bot_ip']
+        )
+        counts['dedup_cache_size'] = len(self._dedup)
+        counts['worker_pid'] = os.getpid()
+        return counts
+
+
+view_filter = ViewFilter()
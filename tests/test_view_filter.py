@@ -0,0 +1,173 @@
+import os
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, routes
+from app.db import get_db
+from app.main import app
+from app.view_filter import TTLDedupCache, ViewFilter
+
+engine = create_engine(
+    os.environ['DATABASE_URL'], connect_args={'check_same_thread': False}, future=True
+)
+TestingSession = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
+
+
+def test_dedup_cache_expires_after_ttl():
+    cache = TTLDedupCache(ttl_seconds=10, max_entries=10)
+    assert cache.seen_recently('a', now=0) is False
+    assert cache.seen_recently('a', now=9.9) is True
+    assert cache.seen_recently('a', now=10) is False
+
+
+def test_dedup_cache_evicts_oldest_when_full():
+    cache = TTLDedupCache(ttl_seconds=100, max_entries=2)
+    cache.seen_recently('a', now=0)
+    cache.seen_recently('b', now=1)
+    cache.seen_recently('c', now=2)
+    assert len(cache) == 2
+    assert cache.seen_recently('a', now=3) is False
+    assert cache.seen_recently('c', now=3) is True
+
+
+def test_dedup_cache_discard_frees_key():
+    cache = TTLDedupCache(ttl_seconds=100, max_entries=10)
+    cache.seen_recently('a', now=0)
+    cache.discard('a')
+    assert cache.seen_recently('a', now=1) is False
+
+
+@pytest.mark.parametrize(
+    'user_agent, expected',
+    [
+        ('Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)', True),
+        ('Mozilla/5.0 (compatible; bingbot/2.0)', True),
+        ('facebookexternalhit/1.1', True),
+        ('curl/8.4.0', True),
+        ('Mozilla/5.0 (Linux; Android 10; CUBOT X30)', False),
+        ('okhttp/4.9.3', False),
+        ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0 Safari/537.36', False),
+        (None, False),
+    ],
+)
+def test_is_bot_user_agent(user_agent, expected):
+    assert ViewFilter().is_bot_user_agent(user_agent) is expected
+
+
+def test_is_bot_ip_matches_ipv4_and_ipv6_ranges():
+    view_filter = ViewFilter(bot_ip_ranges='66.249.64.0/19, 2001:4860:4801::/48')
+    assert view_filter.is_bot_ip('66.249.66.1')
+    assert view_filter.is_bot_ip('2001:4860:4801:10::1')
+    assert not view_filter.is_bot_ip('8.8.8.8')
+    assert not view_filter.is_bot_ip('2001:db8::1')
+    assert not view_filter.is_bot_ip('not-an-ip')
+
+
+def test_invalid_ip_range_raises():
+    with pytest.raises(ValueError, match='VIEW_BOT_IP_RANGES'):
+        ViewFilter(bot_ip_ranges='10.0.0.0/8, 66.249.64/19x')
+
+
+def test_check_runs_bot_filters_before_dedup():
+    view_filter = ViewFilter(bot_ip_ranges='66.249.64.0/19')
+    key = dict(profile_owner_id=1, viewer_name='Ann', ip_address='66.249.66.1')
+    assert view_filter.check(**key) == (False, 'dropped_bot_ip')
+    assert view_filter.check(**key, user_agent='Googlebot/2.1') == (False, 'dropped_bot_user_agent')
+    assert view_filter.metrics()['dedup_cache_size'] == 0
+
+
+def test_check_matches_bot_ranges_against_every_hop():
+    view_filter = ViewFilter(bot_ip_ranges='66.249.64.0/19')
+    accepted, reason = view_filter.check(
+        profile_owner_id=1, viewer_name='Ann', ip_address='8.8.8.8', other_ips=['66.249.66.1']
+    )
+    assert (accepted, reason) == (False, 'dropped_bot_ip')
+
+
+def test_check_counts_accepted_only_once_recorded():
+    view_filter = ViewFilter()
+    key = dict(profile_owner_id=1, viewer_name='Ann', ip_address='8.8.8.8')
+    assert view_filter.check(**key) == (True, 'accepted')
+    assert view_filter.metrics()['accepted'] == 0
+    view_filter.record_accepted()
+    assert view_filter.check(**key) == (False, 'dropped_duplicate')
+    metrics = view_filter.metrics()
+    assert metrics['accepted'] == 1
+    assert metrics['dropped_duplicate'] == 1
+    assert metrics['dropped_total'] == 1
+
+
+@pytest.fixture
+def client(monkeypatch):
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    with TestingSession() as db:
+        db.add(models.User(name='Owner'))
+        db.commit()
+
+    def override_get_db():
+        db = TestingSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(routes, 'view_filter', ViewFilter())
+    monkeypatch.setattr(routes, 'fetch_geo_details', lambda ip_address: {})
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def _view_count():
+    with TestingSession() as db:
+        return db.query(models.ProfileView).count()
+
+
+def test_track_view_repeat_returns_204_without_writing(client):
+    payload = {'profile_owner_id': 1, 'user_name': 'Ann'}
+    first = client.post('/api/track-view', json=payload)
+    assert first.status_code == 200
+    assert first.json()['viewer_name'] == 'Ann'
+
+    repeat = client.post('/api/track-view', json=payload)
+    assert repeat.status_code == 204
+    assert repeat.content == b''
+    assert _view_count() == 1
+
+
+def test_track_view_failed_write_frees_dedup_key(client, monkeypatch):
+    payload = {'profile_owner_id': 1, 'user_name': 'Ann'}
+    real_add_view = crud.add_view
+
+    def failing_add_view(**kwargs):
+        raise RuntimeError('database unavailable')
+
+    monkeypatch.setattr(crud, 'add_view', failing_add_view)
+    with pytest.raises(RuntimeError):
+        client.post('/api/track-view', json=payload)
+    assert _view_count() == 0
+
+    monkeypatch.setattr(crud, 'add_view', real_add_view)
+    retry = client.post('/api/track-view', json=payload)
+    assert retry.status_code == 200
+    assert _view_count() == 1
+    assert routes.view_filter.metrics()['accepted'] == 1
+
+
+def test_track_view_spoofed_forwarded_for_does_not_bypass_bot_ranges(client, monkeypatch):
+    monkeypatch.setattr(routes, 'view_filter', ViewFilter(bot_ip_ranges='66.249.64.0/19'))
+    response = client.post(
+        '/api/track-view',
+        json={'profile_owner_id': 1, 'user_name': 'Ann'},
+        headers={'X-Forwarded-For': '8.8.8.8, 66.249.66.1'},
+    )
+    assert response.status_code == 204
+    assert _view_count() == 0